@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import functools
+import random
+
+region = 'us-east-1'
+
+CATALOG_SIZES = [10, 100, 1000, 10000, 100000]
+
+_EPOCH = datetime.datetime(2020, 1, 1)
+
+
+@functools.lru_cache(maxsize=None)
+def make_images(count, seed=0):
+    """
+    Builds ``count`` synthetic describe_images entries with unique, shuffled
+    creation dates. The newest image always has ImageId ``ami-latest``.
+    """
+    rng = random.Random(seed)
+    offsets = list(range(count))
+    rng.shuffle(offsets)
+    images = []
+    for index, offset in enumerate(offsets):
+        created = _EPOCH + datetime.timedelta(minutes=offset)
+        images.append({
+            "Architecture": "x86_64",
+            "CreationDate": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "ImageId": "ami-latest" if offset == count - 1 else "ami-{0:017x}".format(index),
+            "ImageLocation": "amazon/amzn2-ami-hvm-2.0.{0}-x86_64-ebs".format(index),
+            "ImageType": "machine",
+            "Public": True,
+            "OwnerId": "137112412989",
+            "PlatformDetails": "Linux/UNIX",
+            "State": "available",
+            "BlockDeviceMappings": [
+                {
+                    "DeviceName": "/dev/xvda",
+                    "Ebs": {
+                        "DeleteOnTermination": True,
+                        "SnapshotId": "snap-{0:017x}".format(index),
+                        "VolumeSize": 8,
+                        "VolumeType": "standard",
+                        "Encrypted": False
+                    }
+                }
+            ],
+            "Name": "amzn2-ami-hvm-2.0.{0}-x86_64-ebs".format(index),
+            "RootDeviceName": "/dev/xvda",
+            "RootDeviceType": "ebs",
+            "VirtualizationType": "hvm",
+        })
+    return tuple(images)
+
+
+def make_response(count, seed=0):
+    return {
+        "Images": list(make_images(count, seed)),
+        "ResponseMetadata": {
+            "HTTPStatusCode": 200,
+            "RetryAttempts": 0,
+            "HTTPHeaders": {"content-length": str(count * 900)}
+        }
+    }
+
+
+class StubConnectionManager(object):
+    """
+    Offline stand-in for sceptre's ConnectionManager which answers every
+    describe_images call with a prebuilt response.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def call(self, service, command, kwargs=None, region=None, profile=None, **_):
+        self.calls += 1
+        return self.response
+
+
+class StubStack(object):
+
+    def __init__(self, connection_manager, name="benchmark/stack"):
+        self.name = name
+        self.region = region
+        self.profile = None
+        self.dependencies = []
+        self.connection_manager = connection_manager
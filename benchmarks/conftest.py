@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from benchmarks.catalog import StubConnectionManager, StubStack, make_response
+
+
+@pytest.fixture
+def stub_stack():
+    def _make(count):
+        return StubStack(StubConnectionManager(make_response(count)))
+    return _make
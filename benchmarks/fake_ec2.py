@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import fnmatch
+import random
+import re
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from xml.sax.saxutils import escape
+
+EC2_NAMESPACE = "http://ec2.amazonaws.com/doc/2016-11-15/"
+
+_FILTER_NAME = re.compile(r"^Filter\.(\d+)\.Name$")
+
+
+class FakeEc2Server(ThreadingHTTPServer):
+    """
+    Local stand-in for the EC2 query API that only answers DescribeImages.
+
+    :param images: The describe_images entries to serve, see
+        ``benchmarks.catalog.make_images``.
+    :param latency: Seconds to sleep before answering each request.
+    :param throttle_rate: Probability of answering with RequestLimitExceeded.
+    :param rate_limit: Requests per second allowed before answering with
+        RequestLimitExceeded, or None for no limit.
+    :param max_page_size: Upper bound on images per page when the caller
+        sends MaxResults.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, images, latency=0.0, throttle_rate=0.0, rate_limit=None,
+                 max_page_size=1000, seed=0, address=("127.0.0.1", 0)):
+        super(FakeEc2Server, self).__init__(address, _DescribeImagesHandler)
+        self.images = list(images)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.max_page_size = max_page_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self._thread = None
+
+    @property
+    def endpoint_url(self):
+        host, port = self.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def should_throttle(self):
+        """
+        Counts the request and decides whether to reject it.
+        """
+        with self._lock:
+            self.requests += 1
+            throttled = self.throttle_rate and self._random.random() < self.throttle_rate
+            if not throttled and self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(
+                    float(self.rate_limit),
+                    self._tokens + (now - self._refilled) * self.rate_limit
+                )
+                self._refilled = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    throttled = True
+            if throttled:
+                self.throttled += 1
+            return throttled
+
+    def describe_images(self, params):
+        """
+        Applies the ``name`` filter and pagination to the catalog. Other
+        filters and Owners are accepted but not applied.
+        :returns: The matching page of images and the next token.
+        :rtype: tuple
+        """
+        images = self.images
+        for key, values in params.items():
+            match = _FILTER_NAME.match(key)
+            if not match or values[0] != "name":
+                continue
+            prefix = "Filter.{0}.Value.".format(match.group(1))
+            patterns = [v[0] for k, v in params.items() if k.startswith(prefix)]
+            images = [
+                image for image in images
+                if any(fnmatch.fnmatchcase(image["Name"], p) for p in patterns)
+            ]
+        if "MaxResults" not in params:
+            return images, None
+        page_size = min(int(params["MaxResults"][0]), self.max_page_size)
+        start = int(params.get("NextToken", ["0"])[0])
+        end = start + page_size
+        return images[start:end], (str(end) if end < len(images) else None)
+
+
+class _DescribeImagesHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = parse_qs(self.rfile.read(length).decode("utf-8"))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        action = params.get("Action", [None])[0]
+        if action != "DescribeImages":
+            self._send_error(400, "InvalidAction", "Unsupported action {0}".format(action))
+        elif self.server.should_throttle():
+            self._send_error(503, "RequestLimitExceeded", "Request limit exceeded.")
+        else:
+            images, next_token = self.server.describe_images(params)
+            self._send(200, _images_xml(images, next_token))
+
+    def _send_error(self, status, code, message):
+        self._send(status, (
+            "<Response><Errors><Error><Code>{0}</Code><Message>{1}</Message>"
+            "</Error></Errors><RequestID>{2}</RequestID></Response>"
+        ).format(code, escape(message), uuid.uuid4()))
+
+    def _send(self, status, body):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml;charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _images_xml(images, next_token):
+    items = "".join(
+        "<item><imageId>{0}</imageId><name>{1}</name><creationDate>{2}</creationDate>"
+        "<imageState>{3}</imageState><architecture>{4}</architecture>"
+        "<imageOwnerId>{5}</imageOwnerId><imageType>{6}</imageType>"
+        "<rootDeviceType>{7}</rootDeviceType><virtualizationType>{8}</virtualizationType>"
+        "</item>".format(
+            image["ImageId"], escape(image["Name"]), image["CreationDate"],
+            image["State"], image["Architecture"], image["OwnerId"],
+            image["ImageType"], image["RootDeviceType"], image["VirtualizationType"]
+        )
+        for image in images
+    )
+    token = "<nextToken>{0}</nextToken>".format(next_token) if next_token else ""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<DescribeImagesResponse xmlns="{0}"><requestId>{1}</requestId>'
+        "<imagesSet>{2}</imagesSet>{3}</DescribeImagesResponse>"
+    ).format(EC2_NAMESPACE, uuid.uuid4(), items, token)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end load harness for the ``!aws_ami`` resolver.
+
+Starts a local fake EC2 endpoint, builds a simulated stack group where every
+stack has its own sceptre ``ConnectionManager`` and ``!aws_ami`` resolvers,
+and resolves them all through a thread pool, the way ``sceptre launch`` does
+for a stack group. Run it with::
+
+    python -m benchmarks.load_harness --stacks 500 --workers 20 --latency 0.05
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import botocore
+
+from sceptre.connection_manager import ConnectionManager
+
+from resolver.aws_ami import AwsAmi
+from resolver.aws_ami_metrics import metrics
+
+from benchmarks.catalog import StubStack, make_images, region
+from benchmarks.fake_ec2 import FakeEc2Server
+
+
+# First botocore release that reads AWS_ENDPOINT_URL_EC2; older releases
+# would send the harness' requests to the real EC2 endpoint.
+MIN_BOTOCORE_VERSION = (1, 31, 0)
+
+
+def check_botocore_version(version=botocore.__version__):
+    """
+    Raises RuntimeError if botocore is too old to honour the service
+    specific endpoint environment variable.
+    """
+    parsed = tuple(int(part) for part in version.split(".")[:3] if part.isdigit())
+    if parsed < MIN_BOTOCORE_VERSION:
+        raise RuntimeError(
+            "botocore {0} ignores AWS_ENDPOINT_URL_EC2; the load harness needs "
+            "botocore>={1}".format(version, ".".join(map(str, MIN_BOTOCORE_VERSION)))
+        )
+
+
+@contextmanager
+def fake_aws_environment(endpoint_url, max_attempts=None):
+    """
+    Points boto3 at ``endpoint_url`` with dummy credentials for the duration
+    of the block, restoring the previous environment afterwards.
+    """
+    overrides = {
+        "AWS_ENDPOINT_URL_EC2": endpoint_url,
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_SESSION_TOKEN": "testing",
+        "AWS_DEFAULT_REGION": region,
+        "AWS_EC2_METADATA_DISABLED": "true",
+        "AWS_CONFIG_FILE": os.devnull,
+        "AWS_SHARED_CREDENTIALS_FILE": os.devnull,
+    }
+    if max_attempts is not None:
+        overrides["AWS_MAX_ATTEMPTS"] = str(max_attempts)
+    saved = {key: os.environ.get(key) for key in list(overrides) + ["AWS_PROFILE"]}
+    os.environ.pop("AWS_PROFILE", None)
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def reset_connection_cache():
+    """
+    Drops the boto3 sessions and clients sceptre caches on the
+    ConnectionManager class, so each run builds clients for its own
+    endpoint as a fresh sceptre process would.
+    """
+    with ConnectionManager._session_lock:
+        ConnectionManager._boto_sessions.clear()
+    with ConnectionManager._client_lock:
+        ConnectionManager._clients.clear()
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of ``values``.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered), int(math.ceil(fraction * len(ordered)))) - 1)
+    return ordered[index]
+
+
+def build_stack_group(stacks, resolvers_per_stack, distinct_queries):
+    """
+    Builds ``stacks`` stacks, each with its own ConnectionManager and
+    ``resolvers_per_stack`` AwsAmi resolvers spread over
+    ``distinct_queries`` different queries.
+    :rtype: list
+    """
+    resolvers = []
+    for stack_index in range(stacks):
+        name = "load/stack-{0:04d}".format(stack_index)
+        stack = StubStack(ConnectionManager(region, None, name), name=name)
+        for resolver_index in range(resolvers_per_stack):
+            query = (stack_index * resolvers_per_stack + resolver_index) % distinct_queries
+            argument = {"name": "amzn2-ami-hvm-*", "owners": "amazon"}
+            if distinct_queries > 1:
+                argument["tag:Query"] = "q{0}".format(query)
+            resolvers.append(AwsAmi(argument, stack))
+    return resolvers
+
+
+def _timed_resolve(resolver):
+    start = time.perf_counter()
+    try:
+        resolver.resolve()
+        error = None
+    except Exception as err:
+        error = type(err).__name__
+    return time.perf_counter() - start, error
+
+
+def run(stacks=300, resolvers_per_stack=1, workers=16, images=200,
+        distinct_queries=1, latency=0.05, throttle_rate=0.0, rate_limit=None,
+        max_page_size=1000, max_attempts=None, seed=0):
+    """
+    Runs one load test and returns its report.
+    :rtype: dict
+    """
+    check_botocore_version()
+    metrics.reset()
+    server = FakeEc2Server(
+        make_images(images, seed), latency=latency, throttle_rate=throttle_rate,
+        rate_limit=rate_limit, max_page_size=max_page_size, seed=seed
+    )
+    with server, fake_aws_environment(server.endpoint_url, max_attempts):
+        reset_connection_cache()
+        resolvers = build_stack_group(stacks, resolvers_per_stack, distinct_queries)
+        start = time.perf_counter()
+        # Resolve the first one alone to make sure requests reach the fake
+        # endpoint before the rest of the group is let loose.
+        results = [_timed_resolve(resolvers[0])] if resolvers else []
+        if resolvers and server.requests == 0:
+            raise RuntimeError(
+                "No request reached the fake EC2 endpoint at {0}; boto3 is "
+                "not honouring AWS_ENDPOINT_URL_EC2".format(server.endpoint_url)
+            )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results.extend(executor.map(_timed_resolve, resolvers[1:]))
+        wall_time = time.perf_counter() - start
+
+    latencies = [elapsed for elapsed, _ in results]
+    errors = {}
+    for _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        "stacks": stacks,
+        "resolves": len(results),
+        "workers": workers,
+        "wall_time_seconds": wall_time,
+        "api_calls": server.requests,
+        "resolver_calls": metrics.counter_value(
+            "describe_images_calls", region=region, profile="default"
+        ),
+        "retries": metrics.counter_value(
+            "retries", region=region, profile="default"
+        ),
+        "throttled": server.throttled,
+        "throttle_rate": server.throttled / server.requests if server.requests else 0.0,
+        "errors": errors,
+        "p50_seconds": percentile(latencies, 0.50),
+        "p99_seconds": percentile(latencies, 0.99),
+        "max_seconds": max(latencies) if latencies else None,
+    }
+
+
+def main(argv=None):
+    """The main function"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stacks", type=int, default=300)
+    parser.add_argument("--resolvers-per-stack", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--images", type=int, default=200,
+                        help="number of images in the fake catalog")
+    parser.add_argument("--distinct-queries", type=int, default=1,
+                        help="number of different !aws_ami arguments across the group")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the fake endpoint waits before answering")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="probability of a RequestLimitExceeded answer")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="requests per second before RequestLimitExceeded")
+    parser.add_argument("--max-page-size", type=int, default=1000)
+    parser.add_argument("--max-attempts", type=int, default=None,
+                        help="botocore max attempts (AWS_MAX_ATTEMPTS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(
+        stacks=args.stacks, resolvers_per_stack=args.resolvers_per_stack,
+        workers=args.workers, images=args.images,
+        distinct_queries=args.distinct_queries, latency=args.latency,
+        throttle_rate=args.throttle_rate, rate_limit=args.rate_limit,
+        max_page_size=args.max_page_size, max_attempts=args.max_attempts,
+        seed=args.seed
+    )
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+    else:
+        for key in sorted(report):
+            print("{0}: {1}".format(key, report[key]))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
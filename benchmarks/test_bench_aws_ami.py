@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import tracemalloc
+
+import pytest
+
+from resolver.aws_ami import AwsAmi
+from resolver.aws_ami_metrics import metrics
+
+from benchmarks.catalog import CATALOG_SIZES, make_response
+
+pytest.importorskip("pytest_benchmark")
+
+# Peak memory allowed for selecting from a catalog, in bytes per image on
+# top of a fixed allowance. The debug log line in _get_image_id renders the
+# whole response to a string, which dominates the peak; lower this when
+# that changes.
+SELECTION_PEAK_BYTES_PER_IMAGE = 2048
+SELECTION_PEAK_BYTES_BASE = 64 * 1024
+
+# Median time allowed per call, in seconds, checked on every benchmark run
+# so regressions fail the suite on any machine rather than only against a
+# local saved run. They are set several times above the 1.1.0 figures
+# (~9us argument parsing, ~10us request path, ~8us per image selecting and
+# resolving on a laptop-class CPU) to absorb slower CI hosts.
+ARGUMENT_PARSING_SECONDS = 0.0005
+REQUEST_IMAGE_SECONDS = 0.001
+PER_IMAGE_SECONDS = 0.000025
+PER_CALL_SECONDS = 0.002
+
+RESOLVE_ARGUMENTS = {
+    "str": "amzn2-ami-hvm-2.?.????????.0-x86_64-ebs",
+    "dict": {
+        "name": "amzn2-ami-hvm-2.?.????????.0-x86_64-ebs",
+        "owners": "amazon",
+        "region": "ap-southeast-2",
+        "profile": "OtherAccount",
+        "tag:Name": "test-ami",
+        "tag:branch": ["main", "development"],
+        "architecture": "x86_64",
+    },
+}
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _assert_median_below(benchmark, seconds):
+    # Stats are only collected when benchmarking is enabled.
+    if benchmark.stats is not None:
+        assert benchmark.stats.stats.median < seconds
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.mark.parametrize("kind", sorted(RESOLVE_ARGUMENTS))
+def test_resolve_argument_parsing(benchmark, stub_stack, monkeypatch, kind):
+    benchmark.group = "resolve-arguments"
+    resolver = AwsAmi(RESOLVE_ARGUMENTS[kind], stub_stack(10))
+    monkeypatch.setattr(resolver, "_get_image_id", lambda *args: "ami-latest")
+
+    assert benchmark(resolver.resolve) == "ami-latest"
+    _assert_median_below(benchmark, ARGUMENT_PARSING_SECONDS)
+
+
+@pytest.mark.parametrize("count", CATALOG_SIZES)
+def test_get_image_id_selection(benchmark, stub_stack, count):
+    benchmark.group = "selection"
+    resolver = AwsAmi("amzn2-ami-hvm-*", stub_stack(count))
+    filters = [{"Name": "name", "Values": ["amzn2-ami-hvm-*"]}]
+    response = make_response(count)
+    resolver._request_image = lambda *args: response
+
+    peak = _peak_memory(lambda: resolver._get_image_id(filters, "us-east-1"))
+    benchmark.extra_info["peak_memory_bytes"] = peak
+
+    assert benchmark(resolver._get_image_id, filters, "us-east-1") == "ami-latest"
+    assert peak < SELECTION_PEAK_BYTES_BASE + SELECTION_PEAK_BYTES_PER_IMAGE * count
+    _assert_median_below(benchmark, PER_CALL_SECONDS + PER_IMAGE_SECONDS * count)
+
+
+@pytest.mark.parametrize("count", CATALOG_SIZES)
+def test_request_image(benchmark, stub_stack, count):
+    benchmark.group = "request-image"
+    stack = stub_stack(count)
+    resolver = AwsAmi("amzn2-ami-hvm-*", stack)
+    filters = [{"Name": "name", "Values": ["amzn2-ami-hvm-*"]}]
+
+    response = benchmark(resolver._request_image, filters, "us-east-1", None, ["amazon"])
+
+    assert len(response["Images"]) == count
+    assert stack.connection_manager.calls > 0
+    _assert_median_below(benchmark, REQUEST_IMAGE_SECONDS)
+
+
+@pytest.mark.parametrize("count", CATALOG_SIZES)
+def test_resolve_end_to_end(benchmark, stub_stack, count):
+    benchmark.group = "resolve"
+    resolver = AwsAmi({"name": "amzn2-ami-hvm-*", "owners": "amazon"}, stub_stack(count))
+
+    peak = _peak_memory(resolver.resolve)
+    benchmark.extra_info["peak_memory_bytes"] = peak
+
+    assert benchmark(resolver.resolve) == "ami-latest"
+    assert peak < SELECTION_PEAK_BYTES_BASE + SELECTION_PEAK_BYTES_PER_IMAGE * count
+    _assert_median_below(benchmark, PER_CALL_SECONDS + PER_IMAGE_SECONDS * count)
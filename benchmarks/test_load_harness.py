@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+
+import pytest
+
+from benchmarks.catalog import make_images
+from benchmarks.fake_ec2 import FakeEc2Server
+from benchmarks.load_harness import check_botocore_version, percentile, run
+
+
+def test_percentile():
+    values = [0.5, 0.1, 0.4, 0.2, 0.3]
+    assert percentile(values, 0.5) == 0.3
+    assert percentile(values, 0.99) == 0.5
+    assert percentile([], 0.5) is None
+
+
+def test_fake_server_filters_and_paginates():
+    server = FakeEc2Server(make_images(25))
+    params = {
+        "Filter.1.Name": ["name"],
+        "Filter.1.Value.1": ["amzn2-ami-hvm-2.0.1*"],
+        "MaxResults": ["5"],
+    }
+
+    page, next_token = server.describe_images(params)
+    assert len(page) == 5
+    assert next_token == "5"
+
+    params["NextToken"] = [next_token]
+    page, next_token = server.describe_images(params)
+    assert len(page) == 5
+    assert next_token == "10"
+
+    params["NextToken"] = [next_token]
+    page, next_token = server.describe_images(params)
+    assert [image["Name"] for image in page] == ["amzn2-ami-hvm-2.0.19-x86_64-ebs"]
+    assert next_token is None
+    server.server_close()
+
+
+def test_fake_server_throttles_at_rate():
+    server = FakeEc2Server([], throttle_rate=1.0)
+    assert server.should_throttle()
+    assert server.throttled == server.requests == 1
+    server.server_close()
+
+
+def test_run_small_stack_group():
+    report = run(stacks=20, workers=4, images=50, latency=0.0)
+
+    assert report["resolves"] == 20
+    assert report["errors"] == {}
+    assert report["api_calls"] == report["resolver_calls"] == 20
+    assert report["throttle_rate"] == 0.0
+
+
+def test_run_with_throttling_retries():
+    report = run(stacks=20, workers=4, images=10, latency=0.0, throttle_rate=0.2, seed=1)
+
+    assert report["errors"] == {}
+    assert report["throttled"] > 0
+    assert report["api_calls"] == report["resolver_calls"] + report["throttled"]
+
+
+def test_check_botocore_version():
+    check_botocore_version("1.31.0")
+    check_botocore_version("1.43.114")
+    with pytest.raises(RuntimeError):
+        check_botocore_version("1.29.127")
+
+
+def test_run_fails_fast_when_endpoint_is_ignored(monkeypatch):
+    monkeypatch.setattr(
+        "benchmarks.load_harness.fake_aws_environment",
+        lambda endpoint_url, max_attempts=None: _unchanged_environment()
+    )
+    monkeypatch.setattr("benchmarks.load_harness.build_stack_group", lambda *args: [_NoCallResolver()] * 3)
+
+    with pytest.raises(RuntimeError):
+        run(stacks=3, workers=2, images=10, latency=0.0)
+
+
+class _NoCallResolver(object):
+
+    def resolve(self):
+        return "ami-latest"
+
+
+@contextmanager
+def _unchanged_environment():
+    yield
@@ -1,16 +1,22 @@
 # -*- coding: utf-8 -*-
 
-import abc
-import six
+# Sceptre imports every registered resolver on each run, so this module only
+# imports what is needed to define the resolver. The metrics registry is
+# imported on first resolve() and the profiling module only when profiling
+# is switched on.
 import logging
+import os
+import time
 
-from botocore.exceptions import ClientError
 from sceptre.resolvers import Resolver
 from resolver.aws_ami_exceptions import ImageNotFoundError
 
 TEMPLATE_EXTENSION = ".yaml"
 
-@six.add_metaclass(abc.ABCMeta)
+PROFILE_DIR_ENV = "AWS_AMI_PROFILE_DIR"
+
+THROTTLING_ERROR_CODES = ("RequestLimitExceeded", "Throttling", "ThrottlingException")
+
 class AwsAmiBase(Resolver):
     """
     A abstract base class which provides methods for getting Image ID.
@@ -29,13 +35,19 @@ class AwsAmiBase(Resolver):
         :rtype: str
         :raises: KeyError
         """
+        from resolver.aws_ami_metrics import COUNT_BUCKETS, metrics
+
         response = self._request_image(filters, region, profile, owners)
 
         try:
             self.logger.debug("Got response: {0}".format(response))
-            unsorted_images = response['Images']
-            sorted_images = sorted(unsorted_images, key=lambda x: x['CreationDate'],reverse=True)
-            return sorted_images[0]['ImageId']
+            labels = {"region": region, "profile": profile or "default"}
+            with metrics.timer("selection_seconds", **labels):
+                unsorted_images = response['Images']
+                metrics.observe("images_returned", len(unsorted_images),
+                                buckets=COUNT_BUCKETS, **labels)
+                sorted_images = sorted(unsorted_images, key=lambda x: x['CreationDate'],reverse=True)
+                return sorted_images[0]['ImageId']
         except KeyError:
             self.logger.error("%s - Invalid response looking for: %s",
                               self.stack.name, filters)
@@ -48,13 +60,19 @@ class AwsAmiBase(Resolver):
         :rtype: dict
         :raises: resolver.exceptions.ImageNotFoundError
         """
+        from botocore.exceptions import ClientError
+        from resolver.aws_ami_metrics import metrics
+
         connection_manager = self.stack.connection_manager
+        labels = {"region": region, "profile": profile or "default"}
 
+        start = time.perf_counter()
         try:
             self.logger.debug("Calling ec2.describe_images")
             kwargs = {"Filters": filters}
             if owners:
                 kwargs["Owners"] = owners
+            metrics.increment("describe_images_calls", **labels)
             response = connection_manager.call(
                 service="ec2",
                 command="describe_images",
@@ -64,6 +82,10 @@ class AwsAmiBase(Resolver):
             )
             self.logger.debug("Finished calling ec2.describe_images")
         except ClientError as e:
+            metrics.increment("describe_images_errors",
+                              code=e.response["Error"]["Code"], **labels)
+            if e.response["Error"]["Code"] in THROTTLING_ERROR_CODES:
+                metrics.increment("throttled_calls", **labels)
             if "ImageNotFound" in e.response["Error"]["Code"]:
                 self.logger.error("%s - ImageNotFound: %s",
                                   self.stack.name, kwargs)
@@ -71,11 +93,39 @@ class AwsAmiBase(Resolver):
             else:
                 raise e
         except Exception as err:
+            metrics.increment("describe_images_errors",
+                              code=type(err).__name__, **labels)
             print(f"Unexpected {err}, {type(err)}")
             raise
             
         else:
+            self._record_response_metadata(response, labels)
             return response
+        finally:
+            metrics.observe("describe_images_latency_seconds",
+                            time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _record_response_metadata(response, labels):
+        """
+        Records retries and payload size reported by botocore for a call.
+        ``retries`` counts every retry botocore made (throttling, 5xx and
+        connection errors alike). ``bytes_deserialized`` is only recorded
+        when EC2 sends a ``content-length`` header; chunked responses are
+        not counted.
+        """
+        from resolver.aws_ami_metrics import metrics
+
+        if not isinstance(response, dict):
+            return
+        metadata = response.get("ResponseMetadata") or {}
+        retries = metadata.get("RetryAttempts")
+        if retries:
+            metrics.increment("retries", retries, **labels)
+        headers = metadata.get("HTTPHeaders") or {}
+        content_length = headers.get("content-length")
+        if content_length is not None and str(content_length).isdigit():
+            metrics.increment("bytes_deserialized", int(content_length), **labels)
 
 
 class AwsAmi(AwsAmiBase):
@@ -83,10 +133,44 @@ class AwsAmi(AwsAmiBase):
     Resolver for retrieving the value of Image ID.
     :param argument: The AMI name to get.
     :type argument: str
+    :param profile_dir: Directory to write cProfile and tracemalloc reports
+        of ``resolve()`` to; the profile covers the ``describe_images`` call
+        made by ``_request_image``. Defaults to the ``AWS_AMI_PROFILE_DIR``
+        environment variable; profiling is off when neither is set.
+    :type profile_dir: str
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, profile_dir=None, **kwargs):
         super(AwsAmi, self).__init__(*args, **kwargs)
+        self._profile_dir = profile_dir or os.environ.get(PROFILE_DIR_ENV) or None
+        if self._profile_dir:
+            self._enable_profiling(self._profile_dir)
+
+    def _recursively_clone(self, stack):
+        """
+        Sceptre builds the resolvers it runs by cloning with
+        ``type(self)(argument, stack)``; carry ``profile_dir`` over to them.
+        """
+        clone = super(AwsAmi, self)._recursively_clone(stack)
+        if self._profile_dir and clone._profile_dir != self._profile_dir:
+            clone._enable_profiling(self._profile_dir)
+        return clone
+
+    def _enable_profiling(self, profile_dir):
+        """
+        Replaces ``resolve`` on this instance with a profiled version,
+        leaving the class untouched.
+        """
+        from resolver.aws_ami_profiling import canonical_query, profiled
+
+        def stack_name():
+            return getattr(self.stack, "name", None)
+
+        self._profile_dir = profile_dir
+        self.resolve = profiled(
+            type(self).resolve.__get__(self), "resolve", profile_dir, stack_name,
+            lambda: canonical_query(self.argument)
+        )
 
     def resolve(self):
         """
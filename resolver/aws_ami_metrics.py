@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+# Upper bounds (in seconds or items) used when rendering histograms as
+# Prometheus buckets. Observations above the last bound land in +Inf.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    25.0, 100.0, 1000.0, 10000.0, 100000.0
+)
+
+# Bucket upper bounds for histograms of counts, e.g. images per query.
+COUNT_BUCKETS = (
+    0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+    25000, 100000
+)
+
+METRICS_FILE_ENV = "AWS_AMI_METRICS_FILE"
+METRICS_STATSD_ENV = "AWS_AMI_METRICS_STATSD"
+METRICS_PROMETHEUS_ENV = "AWS_AMI_METRICS_PROMETHEUS"
+
+METRIC_PREFIX = "aws_ami"
+
+logger = logging.getLogger(__name__)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram(object):
+    """
+    Keeps count, sum, min, max and bucket counts of observed values.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.bucket_counts = list(self.bucket_counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.min = self.min
+        histogram.max = self.max
+        return histogram
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "avg": self.sum / self.count if self.count else None,
+        }
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe store of counters and histograms keyed by name and labels.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        """
+        Adds ``value`` to the counter ``name`` with the given labels.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Records ``value`` in the histogram ``name`` with the given labels.
+        ``buckets`` is used when the histogram is first created; pass
+        ``COUNT_BUCKETS`` for counts rather than durations.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observes the wall time spent in the ``with`` block, in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """
+        Returns a JSON serialisable copy of all metrics.
+        :returns: Counters and histograms, each a list of entries.
+        :rtype: dict
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                dict(histogram.as_dict(), name=name, labels=dict(labels))
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def _items(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = [
+                (key, histogram.copy())
+                for key, histogram in sorted(self._histograms.items())
+            ]
+        return counters, histograms
+
+
+metrics = MetricsRegistry()
+
+
+def write_json_summary(path, registry=metrics):
+    """
+    Writes the registry snapshot as JSON to ``path``.
+    """
+    import json
+
+    with open(path, "w") as summary_file:
+        json.dump(registry.snapshot(), summary_file, indent=2, sort_keys=True)
+
+
+def _prometheus_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        '{0}="{1}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    ) + "}"
+
+
+def format_prometheus(registry=metrics, prefix=METRIC_PREFIX):
+    """
+    Renders the registry in the Prometheus text exposition format.
+    :rtype: str
+    """
+    counters, histograms = registry._items()
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        metric = "{0}_{1}_total".format(prefix, name)
+        if metric not in typed:
+            lines.append("# TYPE {0} counter".format(metric))
+            typed.add(metric)
+        lines.append("{0}{1} {2}".format(metric, _prometheus_labels(labels), value))
+    for (name, labels), histogram in histograms:
+        metric = "{0}_{1}".format(prefix, name)
+        if metric not in typed:
+            lines.append("# TYPE {0} histogram".format(metric))
+            typed.add(metric)
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+            cumulative += count
+            lines.append("{0}_bucket{1} {2}".format(
+                metric, _prometheus_labels(labels, [("le", repr(float(bound)))]), cumulative
+            ))
+        lines.append("{0}_bucket{1} {2}".format(
+            metric, _prometheus_labels(labels, [("le", "+Inf")]), histogram.count
+        ))
+        lines.append("{0}_sum{1} {2}".format(metric, _prometheus_labels(labels), histogram.sum))
+        lines.append("{0}_count{1} {2}".format(metric, _prometheus_labels(labels), histogram.count))
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_textfile(path, registry=metrics, prefix=METRIC_PREFIX):
+    """
+    Writes the registry to ``path`` for the node_exporter textfile collector.
+    The file is replaced atomically so a scrape never sees a partial write.
+    """
+    tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as textfile:
+        textfile.write(format_prometheus(registry, prefix))
+    os.replace(tmp_path, path)
+
+
+def format_statsd(registry=metrics, prefix=METRIC_PREFIX):
+    """
+    Renders the registry as StatsD lines. Labels are folded into the
+    metric name; histograms are reported as their sum (ms for timings)
+    and count.
+    :rtype: list
+    """
+    counters, histograms = registry._items()
+    lines = []
+    for (name, labels), value in counters:
+        lines.append("{0}:{1}|c".format(_statsd_name(prefix, name, labels), value))
+    for (name, labels), histogram in histograms:
+        metric = _statsd_name(prefix, name, labels)
+        lines.append("{0}.count:{1}|c".format(metric, histogram.count))
+        if name.endswith("_seconds"):
+            lines.append("{0}.sum_ms:{1}|c".format(metric, int(histogram.sum * 1000)))
+        else:
+            lines.append("{0}.sum:{1}|c".format(metric, histogram.sum))
+    return lines
+
+
+def _statsd_name(prefix, name, labels):
+    parts = [prefix, name] + [
+        "{0}_{1}".format(k, v).replace(".", "_").replace(":", "_")
+        for k, v in labels
+    ]
+    return ".".join(parts)
+
+
+def push_statsd(host, port=8125, registry=metrics, prefix=METRIC_PREFIX):
+    """
+    Sends the registry to a StatsD daemon over UDP.
+    """
+    import socket
+
+    address = (host, int(port))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for line in format_statsd(registry, prefix):
+            sock.sendto(line.encode("utf-8"), address)
+    finally:
+        sock.close()
+
+
+def _push_statsd_address(address):
+    host, _, port = address.partition(":")
+    push_statsd(host, port or 8125)
+
+
+def _export_at_exit():
+    exports = [
+        (METRICS_FILE_ENV, write_json_summary),
+        (METRICS_PROMETHEUS_ENV, write_prometheus_textfile),
+        (METRICS_STATSD_ENV, _push_statsd_address),
+    ]
+    for env_var, export in exports:
+        target = os.environ.get(env_var)
+        if not target:
+            continue
+        try:
+            export(target)
+        except Exception:
+            logger.exception("Unable to export metrics to %s=%s", env_var, target)
+
+
+atexit.register(_export_at_exit)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+import os
+import re
+import threading
+import time
+
+# Number of allocation sites written to the tracemalloc report.
+TOP_ALLOCATIONS = 25
+
+_local = threading.local()
+
+# Number of profiled calls currently using tracemalloc, and whether it was
+# started by them (rather than by the caller) and must be stopped after.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+logger = logging.getLogger(__name__)
+
+
+def canonical_query(*parts):
+    """
+    Returns a stable JSON representation of the given query parts.
+    :rtype: str
+    """
+    import json
+
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _safe_name(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(value)).strip("_") or "unknown"
+
+
+def _start_tracing(tracemalloc):
+    """
+    Registers a profiled call with tracemalloc, starting it for the first
+    one. Returns the traced memory at the start of the call.
+    """
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0:
+            _tracing_started = not tracemalloc.is_tracing()
+            if _tracing_started:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        _tracing_users += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _stop_tracing(tracemalloc, baseline):
+    """
+    Unregisters a profiled call, stopping tracemalloc after the last one
+    if it was started here.
+    :returns: Peak traced memory above ``baseline`` and a snapshot, or
+        None when tracing was stopped by someone else.
+    :rtype: tuple
+    """
+    global _tracing_users
+    with _tracing_lock:
+        try:
+            if not tracemalloc.is_tracing():
+                return None, None
+            peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+            return peak, tracemalloc.take_snapshot()
+        finally:
+            _tracing_users -= 1
+            if _tracing_users == 0 and _tracing_started and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+def profiled(func, label, profile_dir, stack_name, query):
+    """
+    Wraps ``func`` so that each call runs under cProfile and tracemalloc.
+
+    For every call a ``.prof`` file (loadable with ``pstats``) and a
+    ``.json`` report with the canonical query and peak traced memory are
+    written to ``profile_dir``. Calls nested in an already profiled call are
+    covered by the outer profile and are not profiled again.
+
+    tracemalloc is shared by the process: it stays on while any profiled
+    call runs, and when calls overlap on other threads the reported peak
+    also includes their allocations during the overlap.
+
+    :param func: The callable to wrap.
+    :param label: Name used in file names, e.g. ``resolve``.
+    :param profile_dir: Directory the reports are written to.
+    :param stack_name: Callable returning the stack name.
+    :param query: Callable taking the call arguments, returning the
+        canonical query string.
+    :rtype: callable
+    """
+    # cProfile and tracemalloc are only imported once profiling is on.
+    import cProfile
+    import tracemalloc
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "active", False):
+            return func(*args, **kwargs)
+
+        _local.active = True
+        baseline = _start_tracing(tracemalloc)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this process (e.g. a concurrent
+            # resolve on another thread); keep the memory report only.
+            profiler = None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            _local.active = False
+            try:
+                peak, snapshot = _stop_tracing(tracemalloc, baseline)
+                _write_reports(
+                    profile_dir, label, stack_name(), query(*args, **kwargs),
+                    elapsed, peak, snapshot, profiler
+                )
+            except Exception:
+                logger.exception("Unable to write %s profile to %s",
+                                 label, profile_dir)
+    return wrapper
+
+
+def _write_reports(profile_dir, label, stack_name, query, elapsed, peak, snapshot, profiler):
+    import hashlib
+    import json
+
+    os.makedirs(profile_dir, exist_ok=True)
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+    basename = os.path.join(profile_dir, "{0}-{1}-{2}-{3}".format(
+        _safe_name(stack_name), label, digest, int(time.time() * 1000)
+    ))
+    if profiler is not None:
+        profiler.dump_stats(basename + ".prof")
+    top_allocations = [
+        str(stat) for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ] if snapshot is not None else []
+    with open(basename + ".json", "w") as report_file:
+        json.dump({
+            "stack": stack_name,
+            "call": label,
+            "query": query,
+            "elapsed_seconds": elapsed,
+            "peak_memory_bytes": peak,
+            "top_allocations": top_allocations,
+        }, report_file, indent=2)
@@ -47,7 +47,8 @@ setup(
     license='Apache2',
     url=RESOLVER_URL,
     packages=find_packages(
-        exclude=["*.tests", "*.tests.*", "tests.*", "tests"]),
+        exclude=["*.tests", "*.tests.*", "tests.*", "tests",
+                 "benchmarks", "benchmarks.*"]),
     py_modules=[RESOLVER_MODULE_NAME],
     entry_points={
         'sceptre.resolvers': [
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+
+from resolver.aws_ami_metrics import (
+    COUNT_BUCKETS,
+    METRICS_FILE_ENV,
+    METRICS_PROMETHEUS_ENV,
+    METRICS_STATSD_ENV,
+    MetricsRegistry,
+    _export_at_exit,
+    format_prometheus,
+    format_statsd,
+    write_json_summary,
+    write_prometheus_textfile,
+)
+
+
+region = 'us-east-1'
+
+
+class TestMetricsRegistry(object):
+
+    def setup_method(self, test_method):
+        self.registry = MetricsRegistry()
+
+    def test_increment_counter_per_labels(self):
+        self.registry.increment("describe_images_calls", region=region, profile="default")
+        self.registry.increment("describe_images_calls", region=region, profile="default")
+        self.registry.increment("describe_images_calls", region="ap-southeast-2", profile="default")
+
+        assert self.registry.counter_value(
+            "describe_images_calls", region=region, profile="default"
+        ) == 2
+        assert self.registry.counter_value(
+            "describe_images_calls", region="ap-southeast-2", profile="default"
+        ) == 1
+
+    def test_observe_histogram(self):
+        for value in [3, 1, 2]:
+            self.registry.observe("images_returned", value, region=region)
+
+        histogram = self.registry.histogram("images_returned", region=region)
+        assert histogram.count == 3
+        assert histogram.sum == 6
+        assert histogram.min == 1
+        assert histogram.max == 3
+
+    def test_observe_count_buckets(self):
+        self.registry.observe("images_returned", 3, buckets=COUNT_BUCKETS, region=region)
+        self.registry.observe("images_returned", 40, buckets=COUNT_BUCKETS, region=region)
+
+        text = format_prometheus(self.registry)
+
+        assert 'aws_ami_images_returned_bucket{region="us-east-1",le="5.0"} 1' in text
+        assert 'aws_ami_images_returned_bucket{region="us-east-1",le="50.0"} 2' in text
+        assert self.registry.histogram("images_returned", region=region).buckets == COUNT_BUCKETS
+
+    def test_timer_records_on_exception(self):
+        try:
+            with self.registry.timer("selection_seconds"):
+                raise KeyError("ImageId")
+        except KeyError:
+            pass
+
+        assert self.registry.histogram("selection_seconds").count == 1
+
+    def test_snapshot_is_json_serialisable(self, tmp_path):
+        self.registry.increment("describe_images_calls", region=region)
+        self.registry.observe("describe_images_latency_seconds", 0.2, region=region)
+        summary_path = tmp_path / "metrics.json"
+
+        write_json_summary(str(summary_path), self.registry)
+
+        summary = json.loads(summary_path.read_text())
+        assert summary["counters"] == [
+            {"name": "describe_images_calls", "labels": {"region": region}, "value": 1}
+        ]
+        assert summary["histograms"][0]["count"] == 1
+
+    def test_format_prometheus(self, tmp_path):
+        self.registry.increment("describe_images_calls", region=region)
+        self.registry.observe("describe_images_latency_seconds", 0.2, region=region)
+
+        text = format_prometheus(self.registry)
+
+        assert '# TYPE aws_ami_describe_images_calls_total counter' in text
+        assert 'aws_ami_describe_images_calls_total{region="us-east-1"} 1' in text
+        assert 'aws_ami_describe_images_latency_seconds_bucket{region="us-east-1",le="0.25"} 1' in text
+        assert 'aws_ami_describe_images_latency_seconds_bucket{region="us-east-1",le="0.1"} 0' in text
+        assert 'aws_ami_describe_images_latency_seconds_count{region="us-east-1"} 1' in text
+
+        textfile_path = tmp_path / "aws_ami.prom"
+        write_prometheus_textfile(str(textfile_path), self.registry)
+        assert textfile_path.read_text() == text
+
+    def test_format_statsd(self):
+        self.registry.increment("describe_images_calls", region=region)
+        self.registry.observe("describe_images_latency_seconds", 0.25, region=region)
+
+        assert format_statsd(self.registry) == [
+            "aws_ami.describe_images_calls.region_us-east-1:1|c",
+            "aws_ami.describe_images_latency_seconds.region_us-east-1.count:1|c",
+            "aws_ami.describe_images_latency_seconds.region_us-east-1.sum_ms:250|c",
+        ]
+
+    def test_export_at_exit_logs_failures_and_continues(self, monkeypatch, tmp_path, caplog):
+        textfile_path = tmp_path / "aws_ami.prom"
+        monkeypatch.setenv(METRICS_FILE_ENV, str(tmp_path / "missing" / "metrics.json"))
+        monkeypatch.setenv(METRICS_PROMETHEUS_ENV, str(textfile_path))
+        monkeypatch.setenv(METRICS_STATSD_ENV, "localhost:abc")
+
+        with caplog.at_level(logging.ERROR, logger="resolver.aws_ami_metrics"):
+            _export_at_exit()
+
+        assert textfile_path.exists()
+        assert [record.exc_info[0] for record in caplog.records] == [FileNotFoundError, ValueError]
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from resolver.aws_ami_profiling import canonical_query, profiled
+
+
+class TestProfiling(object):
+
+    def test_canonical_query_is_order_independent(self):
+        assert canonical_query({"name": "a", "owners": ["amazon"]}) == \
+            canonical_query({"owners": ["amazon"], "name": "a"})
+
+    def test_profiled_writes_reports(self, tmp_path):
+        def request_image(filters, region):
+            images = [bytearray(1024) for _ in range(10)]
+            return "ami-123" if images else None
+
+        wrapped = profiled(
+            request_image, "request_image", str(tmp_path),
+            lambda: "my/stack", lambda filters, region: canonical_query(filters, region)
+        )
+
+        assert wrapped([{"Name": "name", "Values": ["a"]}], "us-east-1") == "ami-123"
+
+        files = sorted(os.listdir(str(tmp_path)))
+        assert len(files) == 2
+        assert files[0].startswith("my_stack-request_image-")
+        report = json.loads((tmp_path / files[0]).read_text())
+        assert report["stack"] == "my/stack"
+        assert report["query"] == canonical_query([{"Name": "name", "Values": ["a"]}], "us-east-1")
+        assert report["peak_memory_bytes"] > 0
+        pstats.Stats(str(tmp_path / files[1]))
+
+    def test_profiled_nested_call_profiled_once(self, tmp_path):
+        inner = profiled(
+            lambda: "ami-123", "request_image", str(tmp_path),
+            lambda: "stack", lambda: canonical_query()
+        )
+        outer = profiled(
+            lambda: inner(), "resolve", str(tmp_path),
+            lambda: "stack", lambda: canonical_query()
+        )
+
+        assert outer() == "ami-123"
+        assert all("-resolve-" in name for name in os.listdir(str(tmp_path)))
+
+    def test_profiled_writes_reports_on_error(self, tmp_path):
+        def fail():
+            raise KeyError("ImageId")
+
+        wrapped = profiled(fail, "resolve", str(tmp_path), lambda: None, lambda: canonical_query())
+
+        with pytest.raises(KeyError):
+            wrapped()
+        assert any(name.endswith(".json") for name in os.listdir(str(tmp_path)))
+
+    def test_profiled_overlapping_threads(self, tmp_path):
+        results = {}
+        errors = []
+
+        def make_call(name, delay):
+            def call():
+                time.sleep(delay)
+                return name
+            return profiled(
+                call, "resolve", str(tmp_path), lambda: name, lambda: canonical_query(name)
+            )
+
+        def run(name, delay):
+            try:
+                results[name] = make_call(name, delay)()
+            except Exception as err:
+                errors.append(err)
+
+        threads = [
+            threading.Thread(target=run, args=("short", 0.1)),
+            threading.Thread(target=run, args=("long", 0.5)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert results == {"short": "short", "long": "long"}
+        reports = [
+            json.loads((tmp_path / name).read_text())
+            for name in os.listdir(str(tmp_path)) if name.endswith(".json")
+        ]
+        assert sorted(report["stack"] for report in reports) == ["long", "short"]
+        assert all(report["peak_memory_bytes"] is not None for report in reports)
+        assert not tracemalloc.is_tracing()
+
+    def test_profiled_leaves_caller_tracemalloc_running(self, tmp_path):
+        tracemalloc.start()
+        try:
+            wrapped = profiled(
+                lambda: "ami-123", "resolve", str(tmp_path), lambda: "stack", lambda: canonical_query()
+            )
+            assert wrapped() == "ami-123"
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
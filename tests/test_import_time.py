@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+# Cumulative import time allowed for ``resolver.aws_ami`` in microseconds,
+# best of ROUNDS with bytecode already compiled. Sceptre loads resolver entry
+# points after ``sceptre.cli``, so that is imported first, as in a real
+# sceptre process. The 1.1.0 module took ~0.65ms measured this way.
+IMPORT_TIME_BUDGET_US = 1000
+
+# Modules that must only be loaded on first resolve(), or when profiling is
+# switched on. Only modules that sceptre.cli does not import itself can be
+# checked here.
+LAZY_MODULES = [
+    "cProfile", "tracemalloc", "resolver.aws_ami_metrics", "resolver.aws_ami_profiling",
+]
+
+ROUNDS = 5
+
+_IMPORT_PLUGIN = "import sceptre.cli; import resolver.aws_ami"
+
+
+def _run_python(args, env=None):
+    return subprocess.run(
+        [sys.executable] + args, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env
+    )
+
+
+def plugin_import_time():
+    """
+    Returns the cumulative ``-X importtime`` figure for ``resolver.aws_ami``
+    in microseconds, imported after ``sceptre.cli``.
+    """
+    stderr = _run_python(["-X", "importtime", "-c", _IMPORT_PLUGIN]).stderr
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].rstrip() == " resolver.aws_ami":
+            return int(fields[1])
+    raise AssertionError("resolver.aws_ami missing from importtime output")
+
+
+def test_plugin_import_time():
+    # Populate __pycache__ first so compilation is not measured.
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    _run_python(["-c", _IMPORT_PLUGIN], env=env)
+
+    best = min(plugin_import_time() for _ in range(ROUNDS))
+
+    assert best < IMPORT_TIME_BUDGET_US
+
+
+def test_plugin_import_defers_heavy_modules():
+    stdout = _run_python(["-c", (
+        "import sys; import sceptre.cli; before = set(sys.modules); "
+        "import resolver.aws_ami; print('\\n'.join(set(sys.modules) - before))"
+    )]).stdout
+    imported = set(stdout.split())
+
+    assert [
+        name for name in imported
+        if name in LAZY_MODULES
+    ] == []
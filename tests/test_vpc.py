@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+
 import pytest
 from mock import MagicMock, patch, sentinel
 
@@ -10,6 +12,7 @@ from sceptre.stack import Stack
 
 from resolver.aws_ami import AwsAmi, AwsAmiBase
 from resolver.aws_ami_exceptions import ImageNotFoundError
+from resolver.aws_ami_metrics import metrics
 
 
 region = 'us-east-1'
@@ -183,6 +186,57 @@ class TestImageResolver(object):
             [{'Name': 'name', 'Values': ['amzn2-ami-hvm-2.0.20230320.0-x86_64-ebs']}], custom_region, "new_profile", None
         )
 
+    def test_profiling_off_by_default(self, monkeypatch):
+        monkeypatch.delenv("AWS_AMI_PROFILE_DIR", raising=False)
+        stack = MagicMock(spec=Stack)
+        stack.name = "test_name"
+        stack_image_resolver = AwsAmi("amzn2-ami-hvm-2.0.20230320.0-x86_64-ebs", stack)
+        assert "resolve" not in vars(stack_image_resolver)
+        assert "_request_image" not in vars(stack_image_resolver)
+
+    @patch(
+        "resolver.aws_ami.AwsAmi._get_image_id"
+    )
+    def test_resolve_with_profile_dir(self, mock_get_image_id, tmp_path):
+        stack = MagicMock(spec=Stack)
+        stack.name = "test_name"
+        stack.profile = "test_profile"
+        stack.region = region
+        stack.dependencies = []
+        stack._connection_manager = MagicMock(spec=ConnectionManager)
+        stack_image_resolver = AwsAmi(
+            "amzn2-ami-hvm-2.0.20230320.0-x86_64-ebs", stack, profile_dir=str(tmp_path)
+        )
+        mock_get_image_id.return_value = "ami-04d0fca9fc2734804"
+        assert stack_image_resolver.resolve() == "ami-04d0fca9fc2734804"
+        assert sorted(
+            os.path.splitext(name)[1] for name in os.listdir(str(tmp_path))
+        ) == [".json", ".prof"]
+
+    def test_profiling_from_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("AWS_AMI_PROFILE_DIR", str(tmp_path))
+        stack = MagicMock(spec=Stack)
+        stack.name = "test_name"
+        stack_image_resolver = AwsAmi("amzn2-ami-hvm-2.0.20230320.0-x86_64-ebs", stack)
+        assert stack_image_resolver._profile_dir == str(tmp_path)
+        assert "resolve" in vars(stack_image_resolver)
+
+        override = AwsAmi("amzn2-ami-hvm-2.0.20230320.0-x86_64-ebs", stack, profile_dir="/tmp/other")
+        assert override._profile_dir == "/tmp/other"
+
+    def test_clone_keeps_profile_dir(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("AWS_AMI_PROFILE_DIR", raising=False)
+        stack = MagicMock(spec=Stack)
+        stack.name = "test_name"
+        stack_image_resolver = AwsAmi(
+            "amzn2-ami-hvm-2.0.20230320.0-x86_64-ebs", profile_dir=str(tmp_path)
+        )
+
+        clone = stack_image_resolver._recursively_clone(stack)
+
+        assert clone._profile_dir == str(tmp_path)
+        assert "resolve" in vars(clone)
+
 
 class MockAwsAmiBase(AwsAmiBase):
     """
@@ -520,4 +574,33 @@ class TestAwsAmiBase(object):
         )
 
         with pytest.raises(ImageNotFoundError):
-            self.base_ami._request_image(None, region)
\ No newline at end of file
+            self.base_ami._request_image(None, region)
+
+    def test_request_image_records_metrics(self):
+        metrics.reset()
+        self.stack.connection_manager.call.return_value = {
+            "Images": [],
+            "ResponseMetadata": {
+                "RetryAttempts": 2,
+                "HTTPHeaders": {"content-length": "1024"}
+            }
+        }
+
+        self.base_ami._request_image(None, region, "test_profile")
+
+        labels = {"region": region, "profile": "test_profile"}
+        assert metrics.counter_value("describe_images_calls", **labels) == 1
+        assert metrics.counter_value("retries", **labels) == 2
+        assert metrics.counter_value("bytes_deserialized", **labels) == 1024
+        assert metrics.histogram("describe_images_latency_seconds", **labels).count == 1
+
+    def test_request_image_records_unexpected_error(self):
+        metrics.reset()
+        self.stack.connection_manager.call.side_effect = ConnectionError("Boom!")
+
+        with pytest.raises(ConnectionError):
+            self.base_ami._request_image(None, region, "test_profile")
+
+        labels = {"region": region, "profile": "test_profile"}
+        assert metrics.counter_value("describe_images_errors", code="ConnectionError", **labels) == 1
+        assert metrics.histogram("describe_images_latency_seconds", **labels).count == 1